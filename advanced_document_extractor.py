@@ -0,0 +1,220 @@
+"""Multi-engine OCR extraction with cross-engine consensus.
+
+Runs Tesseract, EasyOCR and PaddleOCR over the same preprocessed page and
+keeps the words a majority of the engines agree on.
+"""
+
+import os
+import subprocess
+import tempfile
+from collections import Counter
+
+import cv2
+import numpy as np
+import pytesseract
+from pdf2image import convert_from_path
+
+import ocr_cache
+
+try:
+    import easyocr
+except ImportError:
+    easyocr = None
+
+try:
+    from paddleocr import PaddleOCR
+except ImportError:
+    PaddleOCR = None
+
+# tessedit_char_whitelist is deliberately absent: it only applies to the
+# legacy engine and silently does nothing under the LSTM engine (--oem 3).
+TESSERACT_CONFIG = '--oem 3 --psm 6'
+
+SHARPEN_KERNEL = np.array([[-1, -1, -1],
+                           [-1, 9, -1],
+                           [-1, -1, -1]])
+
+# Below this many uncached pages, per-image pytesseract calls are cheaper
+# than writing pages to disk for a file-list invocation.
+TESSERACT_BATCH_THRESHOLD = 4
+
+
+class AdvancedDocumentExtractor:
+    """Extract text from scanned PDFs by voting across several OCR engines."""
+
+    def __init__(self, use_gpu=False, engines=('tesseract', 'easyocr', 'paddleocr')):
+        self.use_gpu = use_gpu
+        self.engines = list(engines)
+        self.easyocr_reader = None
+        self.paddle_reader = None
+        if 'easyocr' in self.engines and easyocr is not None:
+            self.easyocr_reader = easyocr.Reader(['en'], gpu=use_gpu)
+        if 'paddleocr' in self.engines and PaddleOCR is not None:
+            self.paddle_reader = PaddleOCR(
+                use_angle_cls=True, lang='en', use_gpu=use_gpu, show_log=False)
+
+    def extract_text_multi_engine(self, pdf_path):
+        """OCR every page of ``pdf_path`` with all configured engines."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            images = convert_from_path(
+                pdf_path,
+                thread_count=max(1, os.cpu_count() - 1),
+                output_folder=tmpdir,
+                fmt='jpeg',
+            )
+            raw_pages = [np.array(image) for image in images]
+
+        # Tesseract wants the binarized page, but EasyOCR and PaddleOCR are
+        # CNNs trained on natural color images — adaptive thresholding both
+        # wastes the preprocessing work (they re-normalize internally) and
+        # hurts their accuracy — so they get a lightly upscaled RGB copy.
+        n_pages = len(raw_pages)
+        engine_pages = []
+        if 'tesseract' in self.engines:
+            binary_pages = [self._advanced_preprocess(page)
+                            for page in raw_pages]
+            engine_pages.append(self._tesseract_extract_batch(binary_pages))
+        if self.easyocr_reader is not None or self.paddle_reader is not None:
+            rgb_pages = [
+                cv2.resize(page, None, fx=2, fy=2,
+                           interpolation=cv2.INTER_CUBIC)
+                for page in raw_pages]
+            if self.easyocr_reader is not None:
+                engine_pages.append(self._easyocr_extract_batch(rgb_pages))
+            if self.paddle_reader is not None:
+                engine_pages.append(
+                    [self._paddleocr_extract(page) for page in rgb_pages])
+
+        pages = []
+        for page_idx in range(n_pages):
+            pages.append(self.consensus_extraction(
+                [per_engine[page_idx] for per_engine in engine_pages]))
+        return '\n\n'.join(pages)
+
+    def _advanced_preprocess(self, image):
+        """Upscale, equalize, sharpen and binarize a page image."""
+        if self.use_gpu and cv2.cuda.getCudaEnabledDeviceCount() > 0:
+            return self._advanced_preprocess_gpu(image)
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        resized = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+        equalized = cv2.equalizeHist(resized)
+        sharpened = cv2.filter2D(equalized, -1, SHARPEN_KERNEL)
+        return cv2.adaptiveThreshold(
+            sharpened, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY, 11, 2)
+
+    def _advanced_preprocess_gpu(self, image):
+        """CUDA port of ``_advanced_preprocess``.
+
+        Every filter runs on a GpuMat so the page crosses the PCIe bus once
+        in each direction instead of between stages. cv2.cuda has no
+        adaptiveThreshold, so a Gaussian local mean plus a compare
+        reproduces ADAPTIVE_THRESH_GAUSSIAN_C on-device.
+        """
+        gpu_image = cv2.cuda_GpuMat()
+        gpu_image.upload(image)
+        gpu_gray = cv2.cuda.cvtColor(gpu_image, cv2.COLOR_RGB2GRAY)
+        gpu_resized = cv2.cuda.resize(
+            gpu_gray, (gpu_gray.size()[0] * 2, gpu_gray.size()[1] * 2),
+            interpolation=cv2.INTER_CUBIC)
+        gpu_equalized = cv2.cuda.equalizeHist(gpu_resized)
+        sharpen = cv2.cuda.createLinearFilter(
+            cv2.CV_8UC1, cv2.CV_8UC1, SHARPEN_KERNEL)
+        gpu_sharpened = sharpen.apply(gpu_equalized)
+        gaussian = cv2.cuda.createGaussianFilter(
+            cv2.CV_8UC1, cv2.CV_8UC1, (11, 11), 0)
+        gpu_mean = gaussian.apply(gpu_sharpened)
+        gpu_offset = cv2.cuda.subtract(gpu_mean, (2, 0, 0, 0))
+        gpu_binary = cv2.cuda.compare(gpu_sharpened, gpu_offset, cv2.CMP_GT)
+        return gpu_binary.download()
+
+    def _tesseract_extract(self, image):
+        cached = ocr_cache.get_text(image.tobytes(), 'tesseract', TESSERACT_CONFIG)
+        if cached is not None:
+            return cached
+        text = pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
+        ocr_cache.put_text(text, image.tobytes(), 'tesseract', TESSERACT_CONFIG)
+        return text
+
+    def _tesseract_extract_batch(self, images):
+        """OCR every page with a single tesseract invocation.
+
+        Each pytesseract call spawns a fresh tesseract process, and process
+        startup plus leptonica init dominates on short pages. Feeding one
+        file list amortizes that across the document; pages are split back
+        apart on the form feed tesseract emits between inputs.
+        """
+        texts = [ocr_cache.get_text(image.tobytes(), 'tesseract', TESSERACT_CONFIG)
+                 for image in images]
+        missing = [i for i, text in enumerate(texts) if text is None]
+        if len(missing) <= TESSERACT_BATCH_THRESHOLD:
+            for i in missing:
+                texts[i] = self._tesseract_extract(images[i])
+            return texts
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            page_paths = []
+            for i in missing:
+                path = os.path.join(tmpdir, f'page-{i}.png')
+                cv2.imwrite(path, images[i])
+                page_paths.append(path)
+            list_path = os.path.join(tmpdir, 'pages.lst')
+            with open(list_path, 'w') as f:
+                f.write('\n'.join(page_paths) + '\n')
+            result = subprocess.run(
+                ['tesseract', list_path, '-', *TESSERACT_CONFIG.split()],
+                capture_output=True, text=True, check=True)
+
+        for i, text in zip(missing, result.stdout.split('\f')):
+            ocr_cache.put_text(text, images[i].tobytes(),
+                               'tesseract', TESSERACT_CONFIG)
+            texts[i] = text
+        return texts
+
+    def _easyocr_extract_batch(self, images):
+        """OCR every page in one batched EasyOCR call.
+
+        Per-image calls pay kernel-launch and GPU-transfer overhead each
+        time; readtext_batched keeps the GPU saturated across the document.
+        Cached pages are skipped and only the misses are batched.
+        """
+        texts = [ocr_cache.get_text(image.tobytes(), 'easyocr')
+                 for image in images]
+        missing = [i for i, text in enumerate(texts) if text is None]
+        if missing:
+            results = self.easyocr_reader.readtext_batched(
+                [images[i] for i in missing], batch_size=8)
+            for i, page_results in zip(missing, results):
+                text = ' '.join(result[1] for result in page_results)
+                ocr_cache.put_text(text, images[i].tobytes(), 'easyocr')
+                texts[i] = text
+        return texts
+
+    def _paddleocr_extract(self, image):
+        cached = ocr_cache.get_text(image.tobytes(), 'paddleocr')
+        if cached is not None:
+            return cached
+        results = self.paddle_reader.ocr(image, cls=True)
+        if not results or results[0] is None:
+            text = ''
+        else:
+            text = ' '.join(line[1][0] for line in results[0])
+        ocr_cache.put_text(text, image.tobytes(), 'paddleocr')
+        return text
+
+    def consensus_extraction(self, extractions):
+        """Keep the words a majority of the engine outputs agree on."""
+        valid_extractions = [e for e in extractions if e and e.strip()]
+        if not valid_extractions:
+            return ''
+        if len(valid_extractions) == 1:
+            return valid_extractions[0]
+
+        # One vote per engine per word; Counter keeps first-seen order, so
+        # the output follows the word order of the first engine that saw it.
+        votes = Counter()
+        for extraction in valid_extractions:
+            votes.update(set(extraction.split()))
+        threshold = len(valid_extractions) // 2
+        return ' '.join(
+            word for word, count in votes.items() if count > threshold)
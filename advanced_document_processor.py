@@ -0,0 +1,407 @@
+"""Advanced PDF processing with OCR and optional vision-model enhancement.
+
+Pipeline: rasterize PDF pages -> OpenCV preprocessing -> Tesseract OCR,
+with optional per-page refinement through the OpenAI or Claude vision APIs.
+"""
+
+import asyncio
+import base64
+import concurrent.futures
+import functools
+import io
+import json
+import os
+import tempfile
+
+import anthropic
+import cv2
+import numpy as np
+import openai
+import pytesseract
+from numba import njit, prange
+from pdf2image import convert_from_path
+from PIL import Image
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+import ocr_cache
+
+# tessedit_char_whitelist is deliberately absent: it only applies to the
+# legacy engine and silently does nothing under the LSTM engine (--oem 3).
+TESSERACT_CONFIG = '--oem 3 --psm 6'
+
+OPENAI_VISION_MODEL = 'gpt-4o'
+CLAUDE_VISION_MODEL = 'claude-3-5-sonnet-20241022'
+
+# Concurrent in-flight vision requests per document.
+VISION_CONCURRENCY = 5
+
+# Documents longer than this go through the 50%-cheaper Batch API instead of
+# real-time calls.
+BATCH_PAGE_THRESHOLD = 10
+BATCH_POLL_INTERVAL = 30
+
+# Longest edge sent to a vision API; bytes and image tokens scale with pixels.
+VISION_MAX_EDGE = 1024
+
+# Denoise cost scales with pixel count, so cap the working resolution first.
+MAX_PREPROCESS_EDGE = 2000
+
+
+def _denoise(gray, denoise_mode):
+    """Denoise a grayscale page.
+
+    ``bilateral`` (default) and ``median`` are 10-50x faster than ``nlm``
+    (non-local means) with near-identical OCR accuracy; keep ``nlm`` for
+    very noisy low-SNR scans and ``none`` for clean born-digital renders.
+    """
+    if denoise_mode == 'bilateral':
+        return cv2.bilateralFilter(gray, 5, 50, 50)
+    if denoise_mode == 'median':
+        return cv2.medianBlur(gray, 3)
+    if denoise_mode == 'nlm':
+        return cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+    if denoise_mode == 'none':
+        return gray
+    raise ValueError(f'unknown denoise_mode: {denoise_mode!r}')
+
+
+VISION_PROMPT = (
+    'Extract all text from this document page. Preserve the reading order '
+    'and return only the extracted text.'
+)
+
+# Deskew sweep: 0.1 degree steps over [-5, 5].
+DESKEW_STEPS = 101
+DESKEW_STEP_DEG = 0.1
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _projection_variances(binary):
+    """Row-projection variance for each candidate skew angle.
+
+    Shears foreground pixels into row bins per angle; the angle whose
+    projection has the highest variance is the one where text lines align.
+    """
+    h, w = binary.shape
+    offset = int(w * 0.1) + 1
+    n_bins = h + 2 * offset
+    variances = np.zeros(DESKEW_STEPS)
+    for k in prange(DESKEW_STEPS):
+        shear = np.tan((k - DESKEW_STEPS // 2) * DESKEW_STEP_DEG * np.pi / 180.0)
+        counts = np.zeros(n_bins, dtype=np.int64)
+        for y in range(h):
+            for x in range(w):
+                if binary[y, x] > 0:
+                    counts[y + int(x * shear) + offset] += 1
+        mean = 0.0
+        for i in range(n_bins):
+            mean += counts[i]
+        mean /= n_bins
+        var = 0.0
+        for i in range(n_bins):
+            diff = counts[i] - mean
+            var += diff * diff
+        variances[k] = var / n_bins
+    return variances
+
+
+def _deskew_angle(binary):
+    """Estimate page skew in degrees with a projection-profile sweep.
+
+    The sweep shears rows by ``y + x*shear``, so the argmax shear is the
+    negative of the text-line slope; negating it yields the rotation that
+    getRotationMatrix2D needs to straighten the page.
+    """
+    variances = _projection_variances(binary)
+    return float(DESKEW_STEPS // 2 - np.argmax(variances)) * DESKEW_STEP_DEG
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _fused_thresh_rotate(denoised, inv_matrix, block=11, c=2.0):
+    """Adaptive-threshold and rotate a page in a single pass.
+
+    Separate adaptiveThreshold and warpAffine calls each stream the whole
+    image through memory; fusing them halves DRAM traffic. Each output pixel
+    is inverse-mapped through ``inv_matrix``, bilinear-sampled from
+    ``denoised`` and compared against the local windowed mean taken from a
+    precomputed integral image.
+    """
+    h, w = denoised.shape
+    integral = np.zeros((h + 1, w + 1), dtype=np.float64)
+    for y in range(h):
+        row = 0.0
+        for x in range(w):
+            row += denoised[y, x]
+            integral[y + 1, x + 1] = integral[y, x + 1] + row
+
+    out = np.empty((h, w), dtype=np.uint8)
+    r = block // 2
+    for yo in prange(h):
+        for xo in range(w):
+            xs = inv_matrix[0, 0] * xo + inv_matrix[0, 1] * yo + inv_matrix[0, 2]
+            ys = inv_matrix[1, 0] * xo + inv_matrix[1, 1] * yo + inv_matrix[1, 2]
+            if xs < 0.0 or ys < 0.0 or xs > w - 1.0 or ys > h - 1.0:
+                out[yo, xo] = 255
+                continue
+            x0 = int(xs)
+            y0 = int(ys)
+            x1 = min(x0 + 1, w - 1)
+            y1 = min(y0 + 1, h - 1)
+            fx = xs - x0
+            fy = ys - y0
+            val = (denoised[y0, x0] * (1.0 - fx) * (1.0 - fy)
+                   + denoised[y0, x1] * fx * (1.0 - fy)
+                   + denoised[y1, x0] * (1.0 - fx) * fy
+                   + denoised[y1, x1] * fx * fy)
+
+            ax0 = max(x0 - r, 0)
+            ay0 = max(y0 - r, 0)
+            ax1 = min(x0 + r + 1, w)
+            ay1 = min(y0 + r + 1, h)
+            mean = (integral[ay1, ax1] - integral[ay0, ax1]
+                    - integral[ay1, ax0] + integral[ay0, ax0]) \
+                / ((ax1 - ax0) * (ay1 - ay0))
+            out[yo, xo] = 255 if val > mean - c else 0
+    return out
+
+
+def _preprocess_page(image, denoise_mode='bilateral'):
+    """Denoise, binarize and deskew a page image for OCR."""
+    raw = np.array(image)
+    cached = ocr_cache.get_array(raw.tobytes(), 'preprocess', denoise_mode)
+    if cached is not None:
+        return cached
+    gray = cv2.cvtColor(raw, cv2.COLOR_RGB2GRAY)
+    scale = MAX_PREPROCESS_EDGE / max(gray.shape[:2])
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale,
+                          interpolation=cv2.INTER_AREA)
+    denoised = _denoise(gray, denoise_mode)
+
+    # Estimate skew on a quarter-resolution Otsu binarization (ink = 255);
+    # the angle is scale-invariant and this keeps the estimate cheap.
+    small = cv2.resize(denoised, None, fx=0.25, fy=0.25,
+                       interpolation=cv2.INTER_AREA)
+    _, small_binary = cv2.threshold(
+        small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    angle = _deskew_angle(small_binary)
+    if abs(angle) >= (DESKEW_STEPS // 2) * DESKEW_STEP_DEG:
+        # The sweep saturated, so the real skew is outside its range; fall
+        # back to the minAreaRect estimate over foreground pixels.
+        coords = np.column_stack(np.where(small_binary > 0))
+        rect_angle = cv2.minAreaRect(coords)[-1]
+        angle = -(90 + rect_angle) if rect_angle < -45 else -rect_angle
+
+    h, w = denoised.shape[:2]
+    matrix = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    inv_matrix = cv2.invertAffineTransform(matrix)
+    processed = _fused_thresh_rotate(denoised, inv_matrix)
+    ocr_cache.put_array(processed, raw.tobytes(), 'preprocess', denoise_mode)
+    return processed
+
+
+def _process_page(image_path, denoise_mode='bilateral'):
+    """OCR one rasterized page; module-level so it pickles to worker processes."""
+    with Image.open(image_path) as image:
+        raw = image.tobytes()
+        cached = ocr_cache.get_text(
+            raw, 'tesseract', TESSERACT_CONFIG, denoise_mode)
+        if cached is not None:
+            return cached
+        processed = _preprocess_page(image, denoise_mode)
+    text = pytesseract.image_to_string(processed, config=TESSERACT_CONFIG)
+    ocr_cache.put_text(text, raw, 'tesseract', TESSERACT_CONFIG, denoise_mode)
+    return text
+
+
+class AdvancedDocumentProcessor:
+    """OCR a PDF page by page, optionally refining pages with a vision LLM."""
+
+    def __init__(self, openai_api_key=None, anthropic_api_key=None, dpi=300,
+                 denoise_mode='bilateral'):
+        self.dpi = dpi
+        self.denoise_mode = denoise_mode
+        self.openai_client = None
+        self.claude_client = None
+        if openai_api_key:
+            self.openai_client = openai.AsyncOpenAI(api_key=openai_api_key)
+        if anthropic_api_key:
+            self.claude_client = anthropic.AsyncAnthropic(api_key=anthropic_api_key)
+
+    def process_pdf(self, pdf_path, enhance_with='none'):
+        """Extract text from every page of ``pdf_path``.
+
+        ``enhance_with`` may be ``'none'`` (Tesseract only), ``'openai'`` or
+        ``'claude'`` to run each page through the corresponding vision API.
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            page_paths = convert_from_path(
+                pdf_path,
+                dpi=self.dpi,
+                thread_count=max(1, os.cpu_count() - 1),
+                output_folder=tmpdir,
+                fmt='jpeg',
+                paths_only=True,
+            )
+            if enhance_with == 'openai' and self.openai_client is not None:
+                return self._enhance_with_openai_vision(
+                    [Image.open(path) for path in page_paths])
+            if enhance_with == 'claude' and self.claude_client is not None:
+                return self._enhance_with_claude_vision(
+                    [Image.open(path) for path in page_paths])
+
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=os.cpu_count()) as executor:
+                pages = list(executor.map(
+                    functools.partial(_process_page,
+                                      denoise_mode=self.denoise_mode),
+                    page_paths))
+            return '\n\n'.join(pages)
+
+    def _preprocess_image(self, image):
+        """Denoise, binarize and deskew a page image for OCR."""
+        return _preprocess_page(image, self.denoise_mode)
+
+    def _encode_image(self, image):
+        """Preprocess, downscale and base64-encode a page for a vision API.
+
+        The long edge is capped at ``VISION_MAX_EDGE`` px. Strictly binary
+        pages compress best as 1-bit PNG; anything else ships as JPEG q=85.
+        """
+        processed = self._preprocess_image(image)
+        page = Image.fromarray(processed)
+        page.thumbnail((VISION_MAX_EDGE, VISION_MAX_EDGE), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if len(np.unique(processed)) <= 2:
+            page.convert('1').save(buffer, format='PNG', optimize=True)
+            media_type = 'image/png'
+        else:
+            page.save(buffer, format='JPEG', quality=85, optimize=True)
+            media_type = 'image/jpeg'
+        return base64.b64encode(buffer.getvalue()).decode('utf-8'), media_type
+
+    def _openai_page_request(self, image):
+        """Chat-completions request body for one page."""
+        encoded, media_type = self._encode_image(image)
+        return {
+            'model': OPENAI_VISION_MODEL,
+            'messages': [{
+                'role': 'user',
+                'content': [
+                    {'type': 'text', 'text': VISION_PROMPT},
+                    {'type': 'image_url', 'image_url': {
+                        'url': f'data:{media_type};base64,{encoded}'}},
+                ],
+            }],
+            'max_tokens': 4096,
+        }
+
+    def _enhance_with_openai_vision(self, images, use_batch=True):
+        """Extract text from each page with the OpenAI vision API.
+
+        Long documents are submitted through the Batch API (half the price,
+        much higher sustained throughput); short ones use concurrent
+        real-time calls.
+        """
+        if use_batch and len(images) > BATCH_PAGE_THRESHOLD:
+            return asyncio.run(self._enhance_with_openai_batch_async(images))
+        return asyncio.run(self._enhance_with_openai_vision_async(images))
+
+    async def _enhance_with_openai_batch_async(self, images):
+        lines = [
+            json.dumps({
+                'custom_id': f'page-{i}',
+                'method': 'POST',
+                'url': '/v1/chat/completions',
+                'body': self._openai_page_request(image),
+            })
+            for i, image in enumerate(images)
+        ]
+        # The Batch API rejects uploads without a .jsonl filename, so the
+        # in-memory payload is passed as a named file tuple.
+        input_file = await self.openai_client.files.create(
+            file=('batch.jsonl', io.BytesIO('\n'.join(lines).encode('utf-8'))),
+            purpose='batch')
+        batch = await self.openai_client.batches.create(
+            input_file_id=input_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h')
+        while batch.status not in ('completed', 'failed', 'expired', 'cancelled'):
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+            batch = await self.openai_client.batches.retrieve(batch.id)
+        if batch.status != 'completed':
+            raise RuntimeError(
+                f'OpenAI batch {batch.id} finished with status {batch.status}')
+
+        output = await self.openai_client.files.content(batch.output_file_id)
+        pages = {}
+        for line in output.text.splitlines():
+            result = json.loads(line)
+            body = result['response']['body']
+            pages[result['custom_id']] = body['choices'][0]['message']['content']
+        return '\n\n'.join(pages.get(f'page-{i}', '') for i in range(len(images)))
+
+    async def _enhance_with_openai_vision_async(self, images):
+        semaphore = asyncio.Semaphore(VISION_CONCURRENCY)
+
+        @retry(wait=wait_exponential(multiplier=1, max=30),
+               stop=stop_after_attempt(3))
+        async def extract_page(image):
+            request = self._openai_page_request(image)
+            cache_key = json.dumps(request, sort_keys=True)
+            cached = ocr_cache.get_text(cache_key, 'openai')
+            if cached is not None:
+                return cached
+            response = await self.openai_client.chat.completions.create(
+                **request)
+            text = response.choices[0].message.content
+            ocr_cache.put_text(text, cache_key, 'openai')
+            return text
+
+        async def extract_page_limited(image):
+            async with semaphore:
+                return await extract_page(image)
+
+        pages = await asyncio.gather(
+            *[extract_page_limited(image) for image in images])
+        return '\n\n'.join(pages)
+
+    def _enhance_with_claude_vision(self, images):
+        """Extract text from each page with the Claude vision API."""
+        return asyncio.run(self._enhance_with_claude_vision_async(images))
+
+    async def _enhance_with_claude_vision_async(self, images):
+        semaphore = asyncio.Semaphore(VISION_CONCURRENCY)
+
+        @retry(wait=wait_exponential(multiplier=1, max=30),
+               stop=stop_after_attempt(3))
+        async def extract_page(image):
+            encoded, media_type = self._encode_image(image)
+            cached = ocr_cache.get_text(encoded, CLAUDE_VISION_MODEL)
+            if cached is not None:
+                return cached
+            response = await self.claude_client.messages.create(
+                model=CLAUDE_VISION_MODEL,
+                max_tokens=4096,
+                messages=[{
+                    'role': 'user',
+                    'content': [
+                        {'type': 'image', 'source': {
+                            'type': 'base64',
+                            'media_type': media_type,
+                            'data': encoded}},
+                        {'type': 'text', 'text': VISION_PROMPT},
+                    ],
+                }],
+            )
+            text = response.content[0].text
+            ocr_cache.put_text(text, encoded, CLAUDE_VISION_MODEL)
+            return text
+
+        async def extract_page_limited(image):
+            async with semaphore:
+                return await extract_page(image)
+
+        pages = await asyncio.gather(
+            *[extract_page_limited(image) for image in images])
+        return '\n\n'.join(pages)
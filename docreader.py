@@ -0,0 +1,136 @@
+"""Read text content out of PDF, DOCX, PPTX, XLSX and plain-text files."""
+
+import io
+import mmap
+import os
+import re
+import zipfile
+
+import filetype
+import PyPDF2
+from lxml import etree
+from openpyxl import load_workbook
+
+_WS_TABLE = str.maketrans({'\n': ' ', '\r': ' ', '\t': ' '})
+_MULTISPACE = re.compile(r'\s+')
+
+_HEADER_XMLS = re.compile('word/header[0-9]*.xml')
+_FOOTER_XMLS = re.compile('word/footer[0-9]*.xml')
+_SLIDE_XMLS = re.compile('ppt/slides/slide[0-9]+.xml')
+_NOTES_XMLS = re.compile('ppt/notesSlides/notesSlide[0-9]+.xml')
+
+
+def _byte_len(content):
+    """UTF-8 byte length of ``content``."""
+    return len(content.encode('utf-8'))
+
+
+def clean_text(content):
+    """Collapse all whitespace in ``content`` to single spaces."""
+    return _MULTISPACE.sub(' ', content.translate(_WS_TABLE)).strip()
+
+
+def xml2text(xml):
+    """Concatenate the text nodes of an Office XML part.
+
+    Streams through lxml's iterparse and clears each element as it goes, so
+    memory stays constant instead of holding the whole DOM, and fragments
+    are joined once at the end rather than concatenated quadratically.
+    """
+    parts = []
+    for _, elem in etree.iterparse(io.BytesIO(xml), events=('end',)):
+        if elem.text:
+            parts.append(elem.text)
+            parts.append(' ')
+        elem.clear()
+    return ''.join(parts)
+
+
+def extract_text_from_docx(file_obj):
+    """Pull headers, body and footers out of a DOCX archive.
+
+    ``file_obj`` is any seekable binary file-like object (an mmap, a
+    ``BytesIO``, or an open file).
+    """
+    parts = []
+    zipf = zipfile.ZipFile(file_obj)
+    filelist = zipf.namelist()
+
+    for fname in filelist:
+        if _HEADER_XMLS.match(fname):
+            parts.append(xml2text(zipf.read(fname)))
+
+    parts.append(xml2text(zipf.read('word/document.xml')))
+
+    for fname in filelist:
+        if _FOOTER_XMLS.match(fname):
+            parts.append(xml2text(zipf.read(fname)))
+
+    zipf.close()
+    return ''.join(parts)
+
+
+def extract_text_from_pptx(file_obj):
+    """Pull slide and notes text out of a PPTX archive.
+
+    ``file_obj`` is any seekable binary file-like object.
+    """
+    parts = []
+    zipf = zipfile.ZipFile(file_obj)
+    filelist = zipf.namelist()
+
+    for fname in sorted(filelist):
+        if _SLIDE_XMLS.match(fname):
+            parts.append(xml2text(zipf.read(fname)))
+
+    for fname in sorted(filelist):
+        if _NOTES_XMLS.match(fname):
+            parts.append(xml2text(zipf.read(fname)))
+
+    zipf.close()
+    return ''.join(parts)
+
+
+def read_document(path):
+    """Return ``(content, utf8_byte_length)`` for the document at ``path``.
+
+    The file is memory-mapped rather than slurped into a bytes object, so
+    peak memory stays at one copy of the document and the OS page cache
+    serves the parsers' random access (e.g. PDF cross-reference reads).
+    """
+    # mmap refuses zero-length files, which are otherwise valid input.
+    if os.path.getsize(path) == 0:
+        return '', 0
+
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            # 261 bytes covers the longest magic number filetype checks.
+            kind = filetype.guess(mm[:261])
+            mime = kind.mime if kind is not None else None
+
+            if mime == 'application/pdf':
+                reader = PyPDF2.PdfReader(mm)
+                content = clean_text(
+                    ' '.join(page.extract_text() for page in reader.pages))
+            elif mime == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
+                content = clean_text(extract_text_from_docx(mm))
+            elif mime == 'application/vnd.openxmlformats-officedocument.presentationml.presentation':
+                content = clean_text(extract_text_from_pptx(mm))
+            elif mime == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet':
+                # read_only streams rows instead of materializing the whole
+                # workbook; data_only returns cached values, not formulas.
+                workbook = load_workbook(mm, read_only=True, data_only=True)
+                parts = []
+                for sheet in workbook.worksheets:
+                    # values_only skips the per-cell Cell object allocation.
+                    for row in sheet.iter_rows(values_only=True):
+                        parts.extend(
+                            str(value) for value in row if value is not None)
+                workbook.close()
+                content = clean_text(' '.join(parts))
+            else:
+                content = clean_text(mm[:].decode('utf-8', errors='ignore'))
+            return content, _byte_len(content)
+        finally:
+            mm.close()
@@ -0,0 +1,52 @@
+"""Content-addressed on-disk cache for preprocessed pages and OCR output.
+
+Keys are blake2b digests of the raw input bytes plus whatever configuration
+went into producing the result, so identical pages hit the cache across
+documents and reruns skip OCR and vision calls entirely.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'docproc')
+
+
+def _digest(*key_parts):
+    digest = hashlib.blake2b(digest_size=20)
+    for part in key_parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def get_text(*key_parts):
+    """Return the cached text for this key, or ``None`` on a miss."""
+    path = os.path.join(CACHE_DIR, _digest(*key_parts) + '.txt')
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return None
+
+
+def put_text(text, *key_parts):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, _digest(*key_parts) + '.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def get_array(*key_parts):
+    """Return the cached ndarray for this key, or ``None`` on a miss."""
+    path = os.path.join(CACHE_DIR, _digest(*key_parts) + '.npy')
+    if os.path.exists(path):
+        return np.load(path)
+    return None
+
+
+def put_array(array, *key_parts):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, _digest(*key_parts) + '.npy')
+    np.save(path, array)
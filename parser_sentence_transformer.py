@@ -0,0 +1,290 @@
+"""Retrieve the most relevant document chunks for a set of queries.
+
+Documents are converted to plain text (with an OCR fallback for scanned
+PDFs), split into fixed-size chunks, embedded with the Arctic embedder and
+greedily selected per query until a character budget is exhausted.
+"""
+
+import concurrent.futures
+import os
+import tempfile
+
+import numpy as np
+import ocrmypdf
+import pymupdf
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+import pypandoc
+import pysbd
+import torch
+from sentence_transformers import SentenceTransformer
+
+_model = None
+
+
+def get_model():
+    """Load the Arctic embedder on first use (lazy singleton).
+
+    Loading at import time cost every importer multi-second startup and
+    ~500 MB of VRAM whether or not it ever embedded anything — including
+    the conversion worker processes, which never do.
+    """
+    global _model
+    if _model is None:
+        _model = SentenceTransformer('Snowflake/snowflake-arctic-embed-m')
+        _model.to('cuda')
+        # FP16 halves memory bandwidth and uses the Tensor Core path.
+        _model.half()
+    return _model
+
+
+# The Arctic encoder truncates at 512 tokens; 480 leaves headroom for the
+# special tokens it adds. Budgeting in characters undershot this badly —
+# 512 chars is roughly 128 tokens, so every chunk wasted ~3/4 of the
+# window and the corpus needed ~4x as many forward passes.
+MAX_CHUNK_TOKENS = 480
+
+
+def chunk_to_length(text, max_tokens=MAX_CHUNK_TOKENS):
+    """Split ``text`` into consecutive chunks of at most ``max_tokens`` tokens."""
+    tokenizer = get_model().tokenizer
+    ids = tokenizer(text, add_special_tokens=False)['input_ids']
+    return [tokenizer.decode(ids[i:i + max_tokens])
+            for i in range(0, len(ids), max_tokens)] or ['']
+
+
+_segmenter = pysbd.Segmenter(language='en', clean=False)
+
+
+def chunk_by_sentences(text, max_tokens=MAX_CHUNK_TOKENS):
+    """Pack whole sentences into windows of at most ``max_tokens`` tokens.
+
+    Hard splits cut sentences mid-word, which hurts retrieval (more chunks
+    must be fetched to recover an answer) and wastes encoder work. The
+    budget is measured in the encoder's own tokens so each window fills
+    its context instead of guessing from characters. Windows slide by
+    roughly half their content for 50% overlap, so an answer straddling a
+    window boundary is still whole in the next one. A single sentence
+    longer than the budget becomes its own chunk (the encoder truncates it).
+    """
+    sentences = [s for s in _segmenter.segment(text) if s.strip()]
+    if not sentences:
+        return ['']
+
+    tokenizer = get_model().tokenizer
+    lengths = [len(ids) for ids in
+               tokenizer(sentences, add_special_tokens=False)['input_ids']]
+
+    chunks = []
+    start = 0
+    while start < len(sentences):
+        end = start
+        length = 0
+        while end < len(sentences) and (
+                end == start or length + lengths[end] <= max_tokens):
+            length += lengths[end]
+            end += 1
+        chunks.append(''.join(sentences[start:end]))
+        if end >= len(sentences):
+            break
+        advanced = start
+        consumed = 0
+        while advanced < end - 1 and consumed < length / 2:
+            consumed += lengths[advanced]
+            advanced += 1
+        start = max(advanced, start + 1)
+    return chunks
+
+
+def extract_text_from_pdf(input_file):
+    """Extract the text layer page by page with PyMuPDF's C extractor."""
+    parts = []
+    with pymupdf.open(input_file) as doc:
+        for i, page in enumerate(doc):
+            page_text = page.get_text()
+            if len(page_text) > 0:
+                parts.append(f'---- Page {i} ----\n{page_text}\n\n')
+    return ''.join(parts)
+
+
+def convert_pdf(input_file):
+    """Extract text from a PDF, OCRing it first when the text layer is thin."""
+    text = extract_text_from_pdf(input_file)
+
+    image_count = 0
+    with pymupdf.open(input_file) as doc:
+        for page in doc:
+            image_count += len(page.get_images())
+
+    if image_count > 0 and len(text) < 1000:
+        out_pdf_file = input_file.replace('.pdf', '_ocr.pdf')
+        ocrmypdf.ocr(input_file, out_pdf_file, force_ocr=True)
+        text = extract_text_from_pdf(out_pdf_file)
+    return text
+
+
+def convert(document, filename):
+    """Convert raw ``document`` bytes to plain text based on the extension."""
+    extension = os.path.splitext(filename)[1].lower()
+    with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as handle:
+        handle.write(document)
+        temp_path = handle.name
+    try:
+        if extension == '.pdf':
+            return convert_pdf(temp_path)
+        return pypandoc.convert_file(temp_path, 'plain')
+    finally:
+        os.unlink(temp_path)
+
+
+def _convert_pair(pair):
+    """Unpack helper for ``executor.map``; module-level so it pickles."""
+    return convert(*pair)
+
+
+def _select_chunks_py(topk_idx, chunk_lens, n_chunks, max_characters):
+    """Pure-Python fallback for ``_select_chunks`` when numba is absent.
+
+    Same round-robin walk: the candidate rows are already sorted, so each
+    "pop" is an O(1) cursor bump rather than a list.pop(0) shift, and a
+    maintained ``remaining`` counter replaces re-summing queue lengths
+    every round.
+    """
+    n_queries, k = topk_idx.shape
+    selected = []
+    seen = set()
+    cursors = [0] * n_queries
+    total_chars = 0
+    remaining = n_queries * k
+    while total_chars < max_characters and remaining > 0:
+        for query_idx in range(n_queries):
+            if cursors[query_idx] >= k:
+                continue
+            flat_idx = int(topk_idx[query_idx, cursors[query_idx]])
+            cursors[query_idx] += 1
+            remaining -= 1
+            if flat_idx in seen:
+                continue
+            seen.add(flat_idx)
+            selected.append(flat_idx)
+            total_chars += int(chunk_lens[flat_idx])
+            if total_chars >= max_characters:
+                break
+    return selected
+
+
+def _select_chunks(topk_idx, chunk_lens, n_chunks, max_characters):
+    """Greedy round-robin selection over per-query ranked candidates.
+
+    ``topk_idx`` is the (Q, k) matrix of flat chunk indices in descending
+    score order. Queries take turns claiming their next-best unseen chunk
+    until the character budget is spent; dedup is a bitset over flat
+    indices and each pop is an O(1) cursor bump.
+    """
+    n_queries, k = topk_idx.shape
+    seen = np.zeros(n_chunks, dtype=np.uint8)
+    selected = np.empty(n_queries * k, dtype=np.int64)
+    cursors = np.zeros(n_queries, dtype=np.int64)
+    n_selected = 0
+    total_chars = 0
+    remaining = n_queries * k
+    while total_chars < max_characters and remaining > 0:
+        for query_idx in range(n_queries):
+            if cursors[query_idx] >= k:
+                continue
+            flat_idx = topk_idx[query_idx, cursors[query_idx]]
+            cursors[query_idx] += 1
+            remaining -= 1
+            if seen[flat_idx]:
+                continue
+            seen[flat_idx] = 1
+            selected[n_selected] = flat_idx
+            n_selected += 1
+            total_chars += chunk_lens[flat_idx]
+            if total_chars >= max_characters:
+                break
+    return selected[:n_selected]
+
+
+if njit is not None:
+    _select_chunks = njit(cache=True)(_select_chunks)
+else:
+    _select_chunks = _select_chunks_py
+
+
+def embed(queries, chunks):
+    """Score every query against every chunk; returns a (Q, N) CUDA tensor.
+
+    Chunks are encoded in length-sorted order so every batch pads to the
+    length of similar neighbours instead of the corpus maximum — the
+    tokenizer pads each batch to its longest member, and document-order
+    batches mix full chunks with short trailing ones. The embeddings are
+    un-permuted back to input order before scoring.
+    """
+    model = get_model()
+    with torch.autocast('cuda', dtype=torch.float16):
+        # normalize_embeddings makes the matmul below a true cosine
+        # similarity with no per-row rescaling anywhere downstream, which is
+        # what the Arctic models expect.
+        query_embeddings = model.encode(
+            queries, prompt_name='query', batch_size=128,
+            convert_to_tensor=True, normalize_embeddings=True)
+        order = np.argsort([len(chunk) for chunk in chunks])
+        sorted_chunks = [chunks[i] for i in order]
+        document_embeddings = model.encode(
+            sorted_chunks, batch_size=128, convert_to_tensor=True,
+            normalize_embeddings=True)
+    inverse = torch.from_numpy(np.argsort(order)).to(document_embeddings.device)
+    document_embeddings = document_embeddings[inverse]
+    return query_embeddings @ document_embeddings.T
+
+
+def predict(queries, documents, document_filenames, max_characters=10000):
+    """Select the most relevant chunks per document for ``queries``.
+
+    Returns ``{doc_idx: [chunk, ...]}`` with chunks in document order,
+    bounded by ``max_characters`` total.
+    """
+    # Conversion (PDF parsing, ocrmypdf, pandoc) is CPU-bound and each
+    # document is independent, so fan out across cores.
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=os.cpu_count()) as executor:
+        converted_docs = list(executor.map(
+            _convert_pair, zip(documents, document_filenames)))
+    chunked_docs = [chunk_by_sentences(doc) for doc in converted_docs]
+
+    # Encode every chunk of every document in one batched call instead of
+    # one embed() per document, which launched 2N tiny GPU batches.
+    all_chunks = []
+    chunk_origins = []
+    for doc_idx, chunks in enumerate(chunked_docs):
+        for chunk_idx, chunk in enumerate(chunks):
+            all_chunks.append(chunk)
+            chunk_origins.append((doc_idx, chunk_idx))
+    scores = embed(queries, all_chunks)
+
+    # Rank on-GPU with a single fused topk; the scores never leave the
+    # device, and only enough candidate indices to fill the character
+    # budget (with slack) ever cross back to the CPU.
+    n_chunks = scores.shape[1]
+    chunk_lens = np.array([len(chunk) for chunk in all_chunks],
+                          dtype=np.int64)
+    avg_chunk_len = max(1, int(chunk_lens.sum()) // max(1, n_chunks))
+    k = min(n_chunks, max(1, (max_characters // avg_chunk_len) * 2))
+    _, topk_idx = torch.topk(scores, k=k, dim=1)
+    topk_idx = topk_idx.cpu().numpy().astype(np.int64)
+    selected = _select_chunks(topk_idx, chunk_lens, n_chunks, max_characters)
+
+    document_embeddings = {doc_idx: [] for doc_idx in range(len(documents))}
+    for flat_idx in selected:
+        doc_idx, chunk_idx = chunk_origins[int(flat_idx)]
+        document_embeddings[doc_idx].append(chunk_idx)
+
+    return {
+        doc_idx: [chunked_docs[doc_idx][chunk_idx]
+                  for chunk_idx in sorted(chunk_idxs)]
+        for doc_idx, chunk_idxs in document_embeddings.items()
+    }
@@ -0,0 +1,69 @@
+"""Baseline PDF text extraction with an ocrmypdf fallback for scanned files."""
+
+import concurrent.futures
+import os
+import threading
+
+import ocrmypdf
+import pypdfium2 as pdfium
+from pypdf import PdfReader
+
+
+class Pdfparser1:
+    """Extract embedded text from a PDF, running OCR when the text layer is thin."""
+
+    def extract_text_from_pdf(self, input_file):
+        """Extract the text layer page by page with PDFium.
+
+        PDFium's C extractor is 5-20x faster than pypdf's pure-Python one;
+        pypdf remains as a fallback for files PDFium refuses.
+        """
+        try:
+            pdf = pdfium.PdfDocument(input_file)
+        except pdfium.PdfiumError:
+            return self._extract_text_with_pypdf(input_file)
+        n_pages = len(pdf)
+        pdf.close()
+
+        # Extraction releases the GIL inside PDFium, but a PdfDocument must
+        # not be shared across threads, so each worker opens its own handle.
+        local = threading.local()
+
+        def extract_page(index):
+            if not hasattr(local, 'pdf'):
+                local.pdf = pdfium.PdfDocument(input_file)
+            page_text = local.pdf[index].get_textpage().get_text_range()
+            if len(page_text) > 0:
+                return f'---- Page {index} ----\n' + page_text + '\n\n'
+            return ''
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=os.cpu_count()) as executor:
+            return ''.join(executor.map(extract_page, range(n_pages)))
+
+    def _extract_text_with_pypdf(self, input_file):
+        """Fallback for encrypted or malformed PDFs."""
+        reader = PdfReader(input_file)
+        text = ''
+        for i, page in enumerate(reader.pages):
+            page_text = page.extract_text()
+            if len(page_text) > 0:
+                text += f'---- Page {i} ----\n' + page_text + '\n\n'
+        return text
+
+    def convert_pdf(self, input_file):
+        text = self.extract_text_from_pdf(input_file)
+        if len(text) >= 1000:
+            # Enough embedded text; no need to even look at the images.
+            return text
+
+        # Lazily parsing image XObjects is expensive, so stop at the first
+        # page that has any instead of counting them all.
+        reader = PdfReader(input_file)
+        has_images = next(
+            (True for page in reader.pages if page.images), False)
+        if has_images:
+            out_pdf_file = input_file.replace('.pdf', '_ocr.pdf')
+            ocrmypdf.ocr(input_file, out_pdf_file, force_ocr=True)
+            text = self.extract_text_from_pdf(out_pdf_file)
+        return text
@@ -0,0 +1,107 @@
+"""Document question answering with Qwen2-VL.
+
+Extracts the text of a PDF (falling back to OCR for scanned files) and asks
+the model a question about it.
+"""
+
+import concurrent.futures
+import os
+import tempfile
+
+import pytesseract
+import torch
+from pdf2image import convert_from_path
+from PIL import Image
+from pypdf import PdfReader
+from transformers import AutoProcessor, Qwen2VLForConditionalGeneration
+
+# --oem 1 selects the plain LSTM engine, tesseract's fastest path.
+OCR_CONFIG = '--oem 1 --psm 6'
+
+
+def _ocr_page(image_path):
+    """OCR one rasterized page; module-level so it pickles to workers."""
+    with Image.open(image_path) as image:
+        return pytesseract.image_to_string(image, config=OCR_CONFIG)
+
+
+def extract_text_from_pdf(pdf_path, max_pages=10):
+    """Extract text directly, or via OCR when the text layer is missing."""
+    try:
+        reader = PdfReader(pdf_path)
+        text = ''
+        for page in reader.pages[:max_pages]:
+            text += page.extract_text() + '\n'
+        if len(text.strip()) > 100:
+            return text
+    except Exception:
+        pass
+
+    # Rasterize with pdftoppm threads while OCR workers chew through the
+    # finished pages, so per-page latency is max(raster, ocr), not the sum.
+    with tempfile.TemporaryDirectory() as tmpdir:
+        page_paths = convert_from_path(
+            pdf_path, last_page=max_pages, thread_count=4,
+            output_folder=tmpdir, fmt='jpeg', paths_only=True)
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=os.cpu_count()) as executor:
+            pages = list(executor.map(_ocr_page, page_paths))
+    return '\n'.join(pages) + '\n'
+
+
+class DocumentAnalyzer:
+    """Answer questions about a document with Qwen2-VL."""
+
+    def __init__(self, model_id='Qwen/Qwen2-VL-7B-Instruct'):
+        # bf16 matches fp16 speed with fp32's exponent range, and FA2 is
+        # markedly faster than the default SDPA/eager attention for long
+        # generations on a 7B model.
+        self.model = Qwen2VLForConditionalGeneration.from_pretrained(
+            model_id, torch_dtype=torch.bfloat16,
+            attn_implementation='flash_attention_2', device_map='cuda')
+        self.model = torch.compile(self.model, mode='reduce-overhead')
+        self.processor = AutoProcessor.from_pretrained(model_id)
+
+    def _build_prompt(self, pdf_path, query):
+        text = extract_text_from_pdf(pdf_path)
+        messages = [{
+            'role': 'user',
+            'content': [{
+                'type': 'text',
+                'text': f'Document:\n{text}\n\nQuestion: {query}',
+            }],
+        }]
+        return self.processor.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=True)
+
+    def analyze_document(self, pdf_path, query):
+        prompt = self._build_prompt(pdf_path, query)
+        inputs = self.processor(
+            text=[prompt], return_tensors='pt').to(self.model.device)
+        output_ids = self.model.generate(
+            **inputs, max_new_tokens=2048, use_cache=True, do_sample=False)
+        generated = output_ids[:, inputs.input_ids.shape[1]:]
+        return self.processor.batch_decode(
+            generated, skip_special_tokens=True)[0]
+
+    def analyze_documents(self, pdf_paths, queries):
+        """Answer one query per document in a single batched generation.
+
+        A loop over analyze_document serializes the generations, leaving
+        the GPU idle between prefill and decode; one left-padded generate
+        call runs them together. (Continuous batching via generate_batch
+        would additionally let short answers leave the batch early, but it
+        needs a paged attention implementation, which the flash-attention-2
+        + torch.compile load path used here does not provide.)
+        """
+        prompts = [self._build_prompt(pdf_path, query)
+                   for pdf_path, query in zip(pdf_paths, queries)]
+        # Left padding keeps every prompt flush against its generation, so
+        # the shared slice below strips exactly the prompt tokens.
+        inputs = self.processor(
+            text=prompts, padding=True, padding_side='left',
+            return_tensors='pt').to(self.model.device)
+        output_ids = self.model.generate(
+            **inputs, max_new_tokens=2048, use_cache=True, do_sample=False)
+        generated = output_ids[:, inputs.input_ids.shape[1]:]
+        return self.processor.batch_decode(generated, skip_special_tokens=True)